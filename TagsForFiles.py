@@ -3,10 +3,16 @@
 
 import argparse
 import datetime
+import errno
+import logging
 import os
-import pprint
+import re
 import shutil
 import sys
+import textwrap
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from os.path import basename
 from os.path import exists
 
@@ -16,10 +22,16 @@ from tinytag import TinyTag
 
 # TODO: Investigate mp3tag (https://mp3tag.de/en)
 
+# Per-file diagnostics go through logging so they can be turned down; summaries are printed.
+log = logging.getLogger(__name__)
+
 # ######################################################################
 # FileRecord
 # ######################################################################
 class FileRecord:
+    # There is one of these per file, so avoid a per-instance __dict__.
+    __slots__ = ('id', '_path', 'file_name', 'file_exists', 'comments', 'tags', 'edited')
+
     def __init__(self, file_id, path, file_exists):
         self.id = file_id
         self.path = path
@@ -28,6 +40,28 @@ class FileRecord:
         self.tags = set()
         self.edited = False
 
+    @property
+    def path(self):
+        return self._path
+
+    @path.setter
+    def path(self, path):
+        """
+        Setting the path also updates file_name, its last component,
+        so that it only needs to be worked out once per path.
+        """
+        self._path = path
+        self.file_name = basename(path)
+
+    def to_text(self):
+        """
+        Return this record in the text file format, including the blank line which ends it.
+        """
+        lines = [self.path]
+        lines.extend(self.comments)
+        lines.append(Util.paragraph_wrap(' '.join(sorted(self.tags)), 72))
+        return '\n'.join(lines) + '\n\n'
+
     def get_variables(self):
         """
         Find all the tags in a file object in the form "<key>=<value>" and build a dict
@@ -35,15 +69,10 @@ class FileRecord:
         """
         variables = {}
         for t in self.tags:
-            if t.find('=') > 0:
-                parsed = t.split('=')
-                if len(parsed) != 2:
-                    continue
-                if parsed[0] is None or len(parsed[0]) == 0:
-                    continue
-                if parsed[1] is None or len(parsed[1]) == 0:
-                    continue
-                variables[parsed[0]] = parsed[1]
+            key, _, value = t.partition('=')
+            # Plain tags, empty keys or values, and values with a further '=' are not variables.
+            if key and value and '=' not in value:
+                variables[key] = value
         return variables
 
 
@@ -53,9 +82,17 @@ class FileRecord:
 class TagsForFiles:
     def __init__(self, tags_file_path=None):
         self.tags_file_path = tags_file_path
-        self.tags = set()
+        self.tags = set()  # Union of the tags of all the file records
         self.file_records = []
         self.edited = False
+        self._path_index = {}  # path -> FileRecord
+        self._tag_index = {}  # tag -> set of paths of the files which have that tag
+        self._existing_paths = set()
+        self._query_cache = {}  # query key -> result, see cached_query()
+        self._lower_paths = None  # list of (lowercase path, FileRecord), built on demand
+        self._lower_tags = None  # list of lowercase tags, built on demand
+        self._sorted_tags = None  # sorted list of all tags, built on demand
+        self._sorted_paths = None  # sorted list of all paths, built on demand
 
         if tags_file_path is not None:
             self.import_text_data_from_file(self.tags_file_path)
@@ -69,31 +106,102 @@ class TagsForFiles:
         file_record.edited = False
         self.edited = True
         self.file_records.append(file_record)
+        self._path_index[file_record.path] = file_record
+        self.index_file_record(file_record)
+
+    def invalidate_caches(self):
+        """
+        Discard any results cached from earlier queries.
+        Called whenever the file records or their tags change.
+        """
+        self._query_cache.clear()
+        self._lower_paths = None
+        self._lower_tags = None
+        self._sorted_tags = None
+        self._sorted_paths = None
+
+    def index_file_record(self, file_record):
+        """
+        Add the tags of a file record to the set of all tags and to the tag index.
+        Must be called whenever tags are added to a record from outside this class.
+        """
         self.tags.update(file_record.tags)
+        for t in file_record.tags:
+            self._tag_index.setdefault(t, set()).add(file_record.path)
+        if file_record.file_exists:
+            self._existing_paths.add(file_record.path)
+        self.invalidate_caches()
+
+    def unindex_file_record(self, file_record):
+        """
+        Remove a file record from the tag index.
+        """
+        for t in file_record.tags:
+            paths = self._tag_index.get(t)
+            if paths is not None:
+                paths.discard(file_record.path)
+        self._existing_paths.discard(file_record.path)
+        self.invalidate_caches()
+
+    def rebuild_tag_index(self):
+        """
+        Rebuild the set of all tags and the tag index from scratch.
+        """
+        self.tags = set()
+        self._tag_index = {}
+        self._existing_paths = set()
+        for f in self.file_records:
+            self.index_file_record(f)
+        self.invalidate_caches()
 
-    def add_path(self, path):
+    def add_path(self, path, check_exists=True):
         """
         Add a file record for the given path.
         If the file record already exists, return it, otherwise create a new record and append it.
+        If check_exists is False, the new record's file_exists is left as None,
+        to be filled in later by check_files_exist().
         """
-        for f in self.file_records:
-            if f.path == path:
-                return f
+        f = self._path_index.get(path)
+        if f is not None:
+            return f
         # We didn't find it; therefore, create it.
-        f = FileRecord(file_id=len(self.file_records), path=path, file_exists=exists(path))
-        if not f.file_exists:
-            print(f"WARNING: Could not find file '{path}'")
+        f = FileRecord(file_id=len(self.file_records), path=path, file_exists=None)
+        if check_exists:
+            f.file_exists = exists(path)
+            if f.file_exists:
+                self._existing_paths.add(path)
+            else:
+                log.warning("Could not find file '%s'", path)
         self.file_records.append(f)
+        self._path_index[path] = f
+        self.invalidate_caches()
         return f
 
+    def check_files_exist(self, file_records):
+        """
+        Set file_exists for each of the given file records.
+        The filesystem is queried for all of them at once on a thread pool,
+        rather than one stat() at a time.
+        """
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(exists, [f.path for f in file_records]))
+        for f, file_exists in zip(file_records, results):
+            f.file_exists = file_exists
+            if file_exists:
+                self._existing_paths.add(f.path)
+            else:
+                log.warning("Could not find file '%s'", f.path)
+        self.invalidate_caches()
+
     def import_text_data(self,
-                         text_data):  # list of lines
+                         text_data):  # iterable of lines, e.g. a list or an open file
         """
         Add data from lines of text to the base data structure
         """
         want_path_name = True  # The next non-blank line will be interpreted as a file path
         want_tags = False  # The next non-blank line will be interpreted as a set of tags
         record = None
+        n_existing_records = len(self.file_records)
 
         for line in text_data:
             stripped_line = line.strip()
@@ -101,59 +209,49 @@ class TagsForFiles:
             if len(stripped_line) == 0:
                 want_path_name = True
                 want_tags = False
-            elif stripped_line[0] == '#':
+            elif stripped_line.startswith('#'):
                 if want_tags:
                     record.comments.append(stripped_line)
                 pass
             else:
                 if want_path_name:
-                    record = self.add_path(stripped_line)
+                    record = self.add_path(stripped_line, check_exists=False)
                     want_path_name = False
                     want_tags = True
                 elif want_tags:
-                    tags_list = [t.strip() for t in stripped_line.split()]
+                    # The same few tags recur across many records, so share one copy of each string.
+                    tags_list = [sys.intern(t) for t in stripped_line.split()]
                     record.tags.update(tags_list)
                     self.tags.update(tags_list)
+                    for t in tags_list:
+                        self._tag_index.setdefault(t, set()).add(record.path)
             pass
+        # Existence checks are batched once all the new records are known.
+        self.check_files_exist(self.file_records[n_existing_records:])
 
     def import_text_data_from_file(self,
                                    filename):
         """
-        Add data from a text file to the base data structure
-        TODO: Parse the file directly instead of reading lines into a buffer and then parsing the buffer.
+        Add data from a text file to the base data structure.
+        The file is parsed as it is read, rather than being read into a buffer first.
         """
         self.tags_file_path = filename
-        file = open(filename, encoding='utf-8')
-        data = file.readlines()
-        file.close()
-        self.import_text_data(data)
+        with open(filename, encoding='utf-8', buffering=1 << 20) as file:
+            self.import_text_data(file)
 
     def build_tagged_files_map(self, only_existing=False):
         """
-        Given a tag4files structure as defined by:
-        - 'tags' a set of tags, each a string
-        - 'file_records' a list of structs for each file:
-          - 'file_id' a numeric file_id
-          - 'path' filepath,
-          - 'file_exists' boolean, does the pathname correspond to an existing file,
-          - 'tags' a set of tags for this file
-          - 'comments' a list of strings, each preceded by '#'
-
         Return a map, where each key is a tag and each value is a set of filenames
         corresponding to files which have the key tag.
 
         If only_existing is set to True, then only return existing files.
 
+        The map is a copy of the tag index, which is kept up to date as records
+        change, so this no longer needs to walk every file record.
         """
-        m = {}
-        for t in self.tags:
-            m[t] = set()
-        for f in self.file_records:
-            if only_existing and not f.file_exists:
-                continue
-            for t in f.tags:
-                m[t].add(f.path)
-        return m
+        if only_existing:
+            return {t: paths & self._existing_paths for t, paths in self._tag_index.items()}
+        return {t: set(paths) for t, paths in self._tag_index.items()}
 
     def get_matching_tagged_files(self, tags, only_existing=False):
         """
@@ -161,50 +259,92 @@ class TagsForFiles:
         """
         if tags is None or len(tags) == 0:
             return []
-        tagged_files_map = self.build_tagged_files_map(only_existing)
 
+        tags = frozenset(tags)
+        return self.cached_query(('tags', tags, only_existing),
+                                 lambda: self._intersect_tagged_files(tags, only_existing))
+
+    def cached_query(self, key, compute):
+        """
+        Return the cached result for key, calling compute() to produce it if there isn't one.
+        Results must be immutable. The cache holds the 256 most recently used results
+        and is emptied by invalidate_caches().
+        """
+        out = self._query_cache.pop(key, None)
+        if out is None:
+            out = compute()
+            if len(self._query_cache) >= 256:
+                # Drop the least recently used entry.
+                del self._query_cache[next(iter(self._query_cache))]
+        # (Re-)inserting the key moves it to the end, so dicts keep their keys in order of use.
+        self._query_cache[key] = out
+        return out
+
+    def _intersect_tagged_files(self, tags, only_existing):
         try:
-            sets = [tagged_files_map[t] for t in tags]
+            sets = [self._tag_index[t] for t in tags]
         except KeyError:
-            return []
+            return frozenset()
+        if only_existing:
+            sets.append(self._existing_paths)
 
-        first = True
-        out = None
-        for s in sets:
-            if first:
-                out = s
-                first = False
-            else:
-                out = out.intersection(s)
-        return out
+        # Start from the smallest set so that the intersection is bounded by its size.
+        # set.intersection() always iterates over the smaller operand, so once the
+        # result is empty the remaining steps cost nothing.
+        sets.sort(key=len)
+        return frozenset(sets[0].intersection(*sets[1:]))
+
+    def get_sorted_tags(self):
+        """
+        Return a sorted list of all tags.
+        The list is cached until the next change, so callers must not modify it.
+        """
+        if self._sorted_tags is None:
+            self._sorted_tags = sorted(self.tags)
+        return self._sorted_tags
+
+    def get_sorted_paths(self):
+        """
+        Return a sorted list of the paths of all file records.
+        The list is cached until the next change, so callers must not modify it.
+        """
+        if self._sorted_paths is None:
+            self._sorted_paths = sorted(self._path_index)
+        return self._sorted_paths
 
     def get_tags_from_files(self, files):
         """
         Return a list of tags which match the given files
         """
         tags = set()
-        for f in self.file_records:
-            if f.path in files:
-                for tag in f.tags:
-                    tags.add(tag)
+        for path in files:
+            f = self._path_index.get(path)
+            if f is not None:
+                tags |= f.tags
         return list(tags)
 
     def find_record_for_path(self, pathname):
-        for f in self.file_records:
-            if f.path == pathname:
-                return f
-        return None
+        return self._path_index.get(pathname)
 
     def get_missing_files(self):
         """
         Return a list of files which are in the index but can't be found on the filesystem.
         """
-        out = []
+        return [f.path for f in self.file_records if not f.file_exists]
+
+    def audit(self):
+        """
+        Return a tuple of (missing files, possibly-duplicated files), the same as
+        get_missing_files() and find_duplicated_filenames() would return, but with
+        the missing files and the filename counts gathered in a single pass.
+        """
+        missing = []
+        counts = Counter()
         for f in self.file_records:
             if not f.file_exists:
-                out.append(f.path)
-            pass
-        return out
+                missing.append(f.path)
+            counts[f.file_name] += 1
+        return missing, self._paths_with_shared_filenames(counts)
 
     def prune(self):
         """
@@ -217,58 +357,51 @@ class TagsForFiles:
                 new_files.append(f)
             else:
                 not_found += 1
+                self.unindex_file_record(f)
+                del self._path_index[f.path]
         self.file_records = new_files
         if not_found > 0:
             print(f"{not_found} files pruned. Export and/or save recommended.")
         pass
 
-    def write_file_records_to_file(self, filename):
+    def write_file_records_to_file(self, filename, records=None):
         """
         Write the base data structure out to a text file.
+        If records is given, it is written as it is instead, e.g. a sorted snapshot of
+        the file records taken by a caller which writes the file on another thread.
         """
-        self.file_records.sort(key=lambda r: r.path)
-        file = open(filename, "w", encoding="utf-8")
-
-        for f in self.file_records:
-            print(f.path, file=file)
-            for c in f.comments:
-                print(c, file=file)
-            tags = f.tags
-            tags_list = list(tags)
-            tags_list.sort()
-
-            p = Util.paragraph_wrap(' '.join(tags_list), 72)
+        if records is None:
+            self.file_records.sort(key=lambda r: r.path)
+            records = self.file_records
 
-            print(p, file=file)
-            print('', file=file)
-
-        file.close()
+        # One block of text per record, written through a large buffer.
+        with open(filename, "w", encoding="utf-8", buffering=1 << 20) as file:
+            file.writelines(f.to_text() for f in records)
 
     def find_duplicated_filenames(self):
         """
-        Returns a list of filenames which are found in
-        more than one pathname in the base data.
-        TODO: Rewrite this whole function.
+        Returns a list of the pathnames in the base data whose filename
+        is shared with at least one other pathname.
         """
-        out = []
-        base_names = set()
-        for f in self.file_records:
-            b = basename(f.path)
-            if b in base_names:
-                out.append(f.path)
-            else:
-                base_names.add(b)
-        return out
+        counts = Counter(f.file_name for f in self.file_records)
+        return self._paths_with_shared_filenames(counts)
 
-    def export(self):
+    def _paths_with_shared_filenames(self, counts):
+        """
+        Returns the pathnames, in record order, whose filename has a count above 1 in counts.
+        """
+        return [f.path for f in self.file_records if counts[f.file_name] > 1]
+
+    def export(self, records=None):
         """
         Write data out to a .txt file
+        :param records: optional snapshot of the file records to write, see write_file_records_to_file().
         :return: the filename of the exported file.
         """
 
         now_file = Util.make_time_stamped_file_name('tags', 'txt')
 
-        self.write_file_records_to_file(now_file)
+        self.write_file_records_to_file(now_file, records)
         print(f'Results written to {now_file}')
         return now_file
 
@@ -303,27 +436,25 @@ class TagsForFiles:
         """
         Return a list of file structs which match term (case-insensitive)
         """
-        out = []
         t = term.lower()
-        for file in self.file_records:
-            p = file.path.lower()
-            if t in p:
-                out.append(file)
-            pass
-        return out
+        return list(self.cached_query(('files-text', t), lambda: self._search_lower_paths(t)))
+
+    def _search_lower_paths(self, t):
+        if self._lower_paths is None:
+            self._lower_paths = [(f.path.lower(), f) for f in self.file_records]
+        return tuple(f for p, f in self._lower_paths if t in p)
 
     def find_matching_tags_for_text_term(self, term):
         """
         Return a list of tags which match term (case-insensitive)
         """
-        out = []
         t = term.lower()
-        for tag in self.tags:
-            tag = tag.lower()
-            if t in tag:
-                out.append(tag)
-            pass
-        return out
+        return list(self.cached_query(('tags-text', t), lambda: self._search_lower_tags(t)))
+
+    def _search_lower_tags(self, t):
+        if self._lower_tags is None:
+            self._lower_tags = [tag.lower() for tag in self.tags]
+        return tuple(tag for tag in self._lower_tags if t in tag)
 
     def find_untracked(self, data_directory=None, extensions=None, write_m3u_file=True):
         """
@@ -334,44 +465,28 @@ class TagsForFiles:
         if data_directory is None:
             data_directory = main_data_directory
         untracked_files_list = []
-        known_files = set()
-
+        extensions_set = frozenset(e.lower() for e in extensions)
+        # Compare absolute paths, so that a relative directory or relative paths in the tags file still match.
+        # Paths are otherwise taken as they are, the same way exists() and the file moves use them.
+        data_directory = os.path.abspath(data_directory)
+        known_files = {os.path.abspath(f.path) for f in self.file_records}
         found_extensions = set()
 
-        for f in self.file_records:
-            known_files.add(f.path)
-
-        gen = os.walk(data_directory)
-        for rec in gen:
-            dir_path = rec[0]
-            # dir_names = rec[1]
-            filenames = rec[2]
-            for filename in filenames:
-                path_tuple = os.path.splitext(filename)
-                if len(path_tuple[1]) > 0:
-                    ext = path_tuple[1][1:]
-                    if ext not in extensions:
-                        found_extensions.add(ext)
-                        pass
-                    pass
-
-                if not Util.ends_with(filename, extensions):
-                    continue
-
-                path = os.path.join(dir_path, filename)
-                if path not in known_files:
-                    untracked_files_list.append(path)
-                    pass
-                pass
-            pass
+        for entry in Util.scan_files(data_directory):
+            name = entry.name
+            dot = name.rfind('.')
+            ext = name[dot + 1:].lower() if dot > 0 else ''
+            if ext not in extensions_set:
+                if len(ext) > 0:
+                    found_extensions.add(ext)
+                continue
+            if entry.path not in known_files:
+                untracked_files_list.append(entry.path)
 
         if write_m3u_file:
             if len(untracked_files_list) > 0:
                 # TODO: Break this out from this function.
-                filename = Util.make_time_stamped_file_name('untracked', 'm3u')
-                f = open(filename, "w", encoding="utf-8")
-                print('\n\n'.join(iter(untracked_files_list)), file=f)
-                f.close()
+                filename = Util.write_m3u_file(untracked_files_list, 'untracked')
                 print(f'Wrote {len(untracked_files_list)} untracked files to {filename}')
                 print(f'Other extensions = {found_extensions}')
             else:
@@ -383,32 +498,37 @@ class TagsForFiles:
         Find any files marked with the tag specified in ttag, and move them to a special
         directory as specified in ddir under the current working directory.
         """
-        to_move = []
         n_moved = 0
         dest_folder = str(os.path.join(main_data_directory, ddir))
         if not os.path.exists(dest_folder):
             os.mkdir(dest_folder)
             pass
-        for f in self.file_records:
-            if ttag in f.tags:
-                file_dir = os.path.dirname(f.path).split('\\')[-1]
-                if file_dir != ddir:
-                    to_move.append(f)
-                    pass
-                pass
-            pass
+        # Only the files which have the tag need to be looked at.
+        to_move = [self._path_index[p] for p in self._tag_index.get(ttag, ())
+                   if basename(os.path.dirname(p)) != ddir]
+        # Moving files from the same directory one after another is kinder to the filesystem.
+        to_move.sort(key=lambda r: os.path.dirname(r.path))
         for f in to_move:
-            file_name = os.path.split(f.path)[1]
             src = f.path
-            dst = os.path.join(dest_folder, file_name)
+            dst = os.path.join(dest_folder, f.file_name)
 
             if os.path.exists(dst):
-                print(f'I wanted to move `{src}` to `{dst}`, but `{dst}` already exists!')
+                log.warning('I wanted to move `%s` to `%s`, but `%s` already exists!', src, dst, dst)
             else:
-                shutil.move(src, dst)
-                print(f'Moved `{src}` to `{dst}`')
+                try:
+                    # A plain rename, if src and dst are on the same filesystem.
+                    os.replace(src, dst)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    shutil.move(src, dst)
+                log.info('Moved `%s` to `%s`', src, dst)
                 n_moved += 1
+                self.unindex_file_record(f)
+                del self._path_index[f.path]
                 f.path = dst
+                self._path_index[dst] = f
+                self.index_file_record(f)
                 pass
             pass
         print(f'Moved {n_moved} files to {ddir}, out of {len(to_move)} requested.')
@@ -439,54 +559,59 @@ class TagsForFiles:
         self.move_if_tagged('to-archive', '.archive')
 
     def extract_all_tags(self):
-        n_records = len(self.file_records)
-        index = 0
-        for f in self.file_records:
-            if f.file_exists:
-                new_tags = Util.extract_tags(f.path)
+        """
+        Add tags taken from the media metadata of every existing file.
+        Reading the metadata is I/O-bound, so the files are read on a thread pool.
+        """
+        records = [f for f in self.file_records if f.file_exists]
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            for f, new_tags in zip(records, executor.map(Util.extract_tags, [f.path for f in records])):
                 f.tags.update(new_tags)
+                self.index_file_record(f)
         pass
 
     def clean_all_tags(self):
+        # Each distinct tag only needs to be transformed once, however many records carry it.
+        cleaned = {}
         for f in self.file_records:
-            old_tags = f.tags
             new_tags = set()
-            for t in old_tags:
-                new_tags.add(Util.transform_to_tag(t))
-                pass
+            for t in f.tags:
+                c = cleaned.get(t)
+                if c is None:
+                    c = cleaned[t] = Util.transform_to_tag(t)
+                new_tags.add(c)
             f.tags = new_tags
             f.edited = True
             pass
         pass
+        self.rebuild_tag_index()
         self.edited = True
 
     def replace_tag(self, target, replace):
-        for f in self.file_records:
-            if target in f.tags:
-                f.tags.remove(target)
-                f.tags.add(replace)
-                f.edited = True
-                pass
+        # Only the records in the target's bucket of the tag index need to change.
+        paths = self._tag_index.pop(target, set())
+        for p in paths:
+            f = self._path_index[p]
+            f.tags.remove(target)
+            f.tags.add(replace)
+            f.edited = True
             pass
+        if paths:
+            self._tag_index.setdefault(replace, set()).update(paths)
         if target in self.tags:
             self.tags.remove(target)
             self.tags.add(replace)
             self.edited = True
             pass
+        self.invalidate_caches()
         pass
 
     def count_tags(self):
-        tag_counts = {}
-        for f in self.file_records:
-            for t in f.tags:
-                if t not in tag_counts:
-                    tag_counts[t] = 0
-                    pass
-                tag_counts[t] += 1
-                pass
-            pass
-        out = sorted(tag_counts.items(), key=lambda i: i[1], reverse=True)
-        return out
+        """
+        Return a list of (tag, count) pairs, most frequent first.
+        """
+        # Each tag's count is the size of its set in the tag index, so no need to visit every record.
+        return Counter({t: len(paths) for t, paths in self._tag_index.items() if len(paths) > 0}).most_common()
 
 
 # ######################################################################
@@ -506,33 +631,39 @@ class Util:
 
     media_extensions = video_extensions + audio_extensions
 
+    # These characters have no business in a tag
+    _tag_delete_table = str.maketrans('', '', '/,()\'\"!&%;^$#@<>{}[]\\|?*~` \r\t\n')
+    _dash_run_re = re.compile('-{2,}')
+
     @staticmethod
     def paragraph_wrap(text_to_reflow, num_columns):
         """
         Restrict a string to <num_columns> width. Add newlines as necessary.
         Compresses multiple spaces between words into single spaces.
-        TODO: Add test methods for this function.
+        Words are never broken, so a word longer than <num_columns> gets a line of its own.
+        """
+        return '\n'.join(textwrap.wrap(' '.join(text_to_reflow.split()), width=num_columns,
+                                       break_long_words=False, break_on_hyphens=False))
+
+    @staticmethod
+    def scan_files(directory):
+        """
+        Yield an os.DirEntry for every file under <directory>, recursively.
+        Uses os.scandir() so that no extra stat() is needed per entry.
+        Directories which can't be read are skipped, as os.walk() would.
         """
-        sub_strings = list(filter(lambda c: len(c) > 0, text_to_reflow.split(' ')))
-        out_list = []
-        build = ''
-        for i in range(0, len(sub_strings)):
-            if len(sub_strings[i]) == 0:
+        pending = [directory]
+        while len(pending) > 0:
+            try:
+                it = os.scandir(pending.pop())
+            except OSError:
                 continue
-            if len(build) + len(sub_strings[i]) < num_columns:
-                build += ' ' + sub_strings[i].strip()
-                pass
-            elif build == '':
-                out_list.append(' ' + sub_strings[i].strip())
-                pass
-            else:
-                out_list.append(build.strip())
-                build = sub_strings[i]
-                pass
-            pass
-        if len(build) > 0:
-            out_list.append(build.strip())
-        return '\n'.join(out_list)
+            with it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file():
+                        yield entry
 
     @staticmethod
     def ends_with(filename, extensions=None):
@@ -562,43 +693,21 @@ class Util:
         """
         if suffix is None:
             suffix = 'm3u'
-        now = datetime.datetime.now()
-        elements = [
-            prefix,
-            f'{now.year}',
-            f'{now.month:02d}',
-            f'{now.day:02d}',
-            f'{now.hour:02d}',
-            f'{now.minute:02d}',
-            f'{now.second:02d}',
-        ]
-        file_name = f"{'-'.join(elements)}.{suffix}"
-        return os.path.join(main_data_directory, file_name)
+        stamp = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+        return os.path.join(main_data_directory, f'{prefix}-{stamp}.{suffix}')
 
     @staticmethod
     def write_m3u_file(path_list, prefix):
         m3u_filename = Util.make_time_stamped_file_name(prefix, 'm3u')
-        f = open(m3u_filename, "w", encoding="utf-8")
-        print('\n'.join(path_list), file=f)
-        f.close()
+        with open(m3u_filename, "w", encoding="utf-8", buffering=1 << 20) as f:
+            print('\n'.join(path_list), file=f)
         return m3u_filename
         pass
 
     @staticmethod
     def transform_to_tag(text):
-        to_remove = '/,()\'\"!&%;^$#@<>{}[]\\|?*~` \r\t\n'  # These characters have no business in a tag
-
-        tag = text.lower().translate({ord(i): None for i in to_remove})
-        tag = tag.replace(' - ', '-') \
-            .replace('    ', '-') \
-            .replace('   ', '-') \
-            .replace('  ', '-') \
-            .replace(' ', '-') \
-            .replace('-----', '-') \
-            .replace('----', '-') \
-            .replace('---', '-') \
-            .replace('--', '-')
-        return tag
+        tag = text.lower().translate(Util._tag_delete_table)
+        return Util._dash_run_re.sub('-', tag)
 
     @staticmethod
     def extract_tags(pathname):
@@ -606,8 +715,7 @@ class Util:
         try:
             tag = TinyTag.get(pathname)
         except tinytag.tinytag.TinyTagException as e:
-            print(f'WARNING: exception for {pathname}:')
-            print(e)
+            log.warning('exception for %s: %s', pathname, e)
             return out
 
         if tag.artist is not None and len(tag.artist) > 0:
@@ -625,11 +733,20 @@ class Util:
 # MainWindow
 # ######################################################################
 class MainWindow:
+    # How long to wait after the last click in a listbox before updating the selection counts.
+    selection_debounce_ms = 50
+    # How often to check whether a background file operation has finished.
+    worker_poll_ms = 100
+
     def __init__(self, tags_for_files_obj: TagsForFiles):
         self.tags_for_files_obj = tags_for_files_obj
-        files_list = [record.path for record in tags_for_files_obj.file_records]
-        tag_list = list(tags_for_files_obj.tags)
-        tag_list.sort()
+        self._selection_pending = False  # The listbox selection has changed but the counts haven't been updated
+        self._worker = None  # Thread running the current background file operation, if any
+        self._worker_result = None  # What the operation returned, or the exception it raised
+        self._worker_done = None  # Called with the result once the operation has finished
+        # These are the cached sorted views, shared with the sort dropdowns rather than copied.
+        files_list = tags_for_files_obj.get_sorted_paths()
+        tag_list = tags_for_files_obj.get_sorted_tags()
         base = tags_for_files_obj.get_base_directory()
         self.layout = [
             [sg.Text(f'Base directory: {base} | {len(files_list)} files | {len(tag_list)} tags')],
@@ -697,13 +814,26 @@ class MainWindow:
 
     def run(self):
         while True:
-            event, values = self.window.read()
+            # Block until the next event, unless a burst of selection clicks is waiting to be counted
+            # or a background operation has to be checked on.
+            timeout = None
+            if self._selection_pending:
+                timeout = MainWindow.selection_debounce_ms
+            elif self._worker is not None:
+                timeout = MainWindow.worker_poll_ms
+            event, values = self.window.read(timeout=timeout)
             # See if user wants to quit or window was closed
             if event == sg.WINDOW_CLOSED or event == 'Quit':
                 break
-            elif event == 'FILES-LISTBOX' or event == 'TAGS-LISTBOX':
+            self.check_background_operation()
+            if event == 'FILES-LISTBOX' or event == 'TAGS-LISTBOX':
+                self._selection_pending = True
+                continue
+            if self._selection_pending:
+                # Any other event, including the timeout, ends the burst.
                 self.update_selection_display()
-            elif event == '-CLEAR-FILES-':
+
+            if event == '-CLEAR-FILES-':
                 self.window['FILES-LISTBOX'].set_value([])
                 self.update_selection_display()
             elif event == '-CLEAR-TAGS-':
@@ -730,6 +860,15 @@ class MainWindow:
             elif event == 'EDIT_UNTRACKED_FILES_BUTTON':
                 self.do_edit_untracked_files()
 
+        if self._worker is not None:
+            # Let a background export or scan finish, so that it can't overlap with the export below
+            # or be cut off when the program exits. Its result is no longer needed.
+            if event == 'Quit':
+                # The window is still open, so say why it isn't closing yet.
+                self.window['FILE_OP_STATUS'].update('Waiting for the current file operation to finish')
+                self.window.refresh()
+            self._worker.join()
+            self._worker = None
         # Finish up by removing from the screen
         self.window.close()
         if self.tags_for_files_obj.edited:
@@ -739,15 +878,16 @@ class MainWindow:
     def select_files_from_tags(self):
         tags_list = self.window['TAGS-LISTBOX'].get()
         file_list = list(self.tags_for_files_obj.get_matching_tagged_files(tags_list))
-        if file_list is None:
-            file_list = []
         if self.window['REPLACE-OR-EXPAND-SELECTION'].get() == 'Expand':
+            seen = set(file_list)
             for f in self.window['FILES-LISTBOX'].get():
-                if f not in file_list:
+                if f not in seen:
                     file_list.append(f)
+                    seen.add(f)
         self.window['FILES-LISTBOX'].set_value(file_list)
 
     def update_selection_display(self):
+        self._selection_pending = False
         n_selected_files = len(self.window['FILES-LISTBOX'].get())
         n_selected_tags = len(self.window['TAGS-LISTBOX'].get())
         self.window['SELECTION_STATUS_TEXT'].update(f'Selected: {n_selected_files} files | {n_selected_tags} tags')
@@ -756,27 +896,33 @@ class MainWindow:
     def select_tags_from_files(self):
         selected_files_list = self.window['FILES-LISTBOX'].get()
         tags_list = list(self.tags_for_files_obj.get_tags_from_files(selected_files_list))
-        if tags_list is None:
-            tags_list = []
         if self.window['REPLACE-OR-EXPAND-SELECTION'].get() == 'Expand':
+            seen = set(tags_list)
             for t in self.window['TAGS-LISTBOX'].get():
-                if t not in tags_list:
+                if t not in seen:
                     tags_list.append(t)
+                    seen.add(t)
         self.window['TAGS-LISTBOX'].set_value(tags_list)
 
+    @staticmethod
+    def selected_first(sorted_items, selected):
+        """
+        Return the items of an already-sorted list with the selected ones moved to the front.
+        Both groups stay in sorted order.
+        """
+        selected_set = set(selected)
+        return ([x for x in sorted_items if x in selected_set] +
+                [x for x in sorted_items if x not in selected_set])
+
     def update_tags_sort_order(self):
         sort_order = self.window['TAGS-DROPDOWN-SORT'].get()
         selected = self.window['TAGS-LISTBOX'].get()
         tags_list = []
 
         if sort_order == 'Alpha':
-            tags_list = list(self.tags_for_files_obj.tags)
-            tags_list.sort()
+            tags_list = self.tags_for_files_obj.get_sorted_tags()
         elif sort_order == 'Selected':
-            tags_list = list(self.tags_for_files_obj.tags)
-            augmented_tag_list = [(t, t in selected) for t in tags_list]
-            sorted_tag_list = sorted(augmented_tag_list, key=lambda x: f' {x[0]}' if x[1] else x[0])
-            tags_list = [t[0] for t in sorted_tag_list]
+            tags_list = self.selected_first(self.tags_for_files_obj.get_sorted_tags(), selected)
         elif sort_order == 'Frequency':
             tags_list = [item[0] for item in self.tags_for_files_obj.count_tags()]
         self.window['TAGS-LISTBOX'].update(tags_list)
@@ -788,29 +934,68 @@ class MainWindow:
         selected = self.window['FILES-LISTBOX'].get()
         file_list = []
         if sort_order == 'Alpha':
-            file_list = [f.path for f in self.tags_for_files_obj.file_records]
-            file_list.sort()
+            file_list = self.tags_for_files_obj.get_sorted_paths()
         elif sort_order == 'Selected':
-            file_list = [f.path for f in self.tags_for_files_obj.file_records]
-            augmented_file_list = [(f, f in selected) for f in file_list]
-            sorted_file_list = sorted(augmented_file_list, key=lambda x: f' {x[0]}' if x[1] else x[0])
-            file_list = [f[0] for f in sorted_file_list]
+            file_list = self.selected_first(self.tags_for_files_obj.get_sorted_paths(), selected)
         self.window['FILES-LISTBOX'].update(file_list)
         self.window['FILES-LISTBOX'].set_value(selected)
         self.update_selection_display()
 
+    def start_background_operation(self, func, on_done):
+        """
+        Run func on a worker thread, so that the window stays responsive.
+        Once it has finished, the event loop calls on_done with its result, or with the
+        exception it raised, so that on_done always gets to restore the window.
+        Only one operation runs at a time; see refuse_if_busy().
+        """
+        def run_func():
+            try:
+                self._worker_result = func()
+            except Exception as e:
+                log.exception('Background file operation failed')
+                self._worker_result = e
+
+        self._worker_done = on_done
+        self._worker = threading.Thread(target=run_func, daemon=True)
+        self._worker.start()
+
+    def check_background_operation(self):
+        if self._worker is None or self._worker.is_alive():
+            return
+        self._worker = None
+        self._worker_done(self._worker_result)
+
+    def refuse_if_busy(self):
+        """
+        Return True, and say so, if a background operation is running.
+        The actions which change the file records check this, since the worker reads them.
+        """
+        if self._worker is None:
+            return False
+        self.window['FILE_OP_STATUS'].update('Please wait for the current file operation to finish')
+        return True
+
     def do_export(self):
+        if self.refuse_if_busy():
+            return
+        # Exporting writes every record, so do it on a worker thread to keep the window responsive.
+        # The worker gets its own sorted list, so that file_records isn't reordered under the window's feet.
+        records = sorted(self.tags_for_files_obj.file_records, key=lambda r: r.path)
         self.window['FILE_OP_STATUS'].update('Writing export file')
-        file_name = self.tags_for_files_obj.export()
-        self.window['FILE_OP_STATUS'].update(f'Wrote {file_name}')
+        self.window['EXPORT-BUTTON'].update(disabled=True)
+        self.start_background_operation(lambda: self.tags_for_files_obj.export(records), self.on_export_done)
+
+    def on_export_done(self, result):
+        self.window['EXPORT-BUTTON'].update(disabled=False)
+        if isinstance(result, Exception):
+            self.window['FILE_OP_STATUS'].update(f'Export failed: {result}')
+            return
+        self.window['FILE_OP_STATUS'].update(f'Wrote {result}')
 
     def do_make_playlist(self):
         self.window['FILE_OP_STATUS'].update('Writing m3u file')
         files_list = self.window['FILES-LISTBOX'].get()
-        filename = Util.make_time_stamped_file_name('playlist', 'm3u')
-        f = open(filename, 'w', encoding='utf-8')
-        print('\n'.join(files_list), file=f)
-        f.close()
+        filename = Util.write_m3u_file(files_list, 'playlist')
         status_message = f'Wrote {len(files_list)} files to {filename}'
         print(status_message)
         self.window['FILE_OP_STATUS'].update(status_message)
@@ -828,12 +1013,25 @@ class MainWindow:
         self.update_selection_display()
 
     def do_edit_untracked_files(self):
-        print('Editing untracked files')
-        files_list = self.tags_for_files_obj.find_untracked(self.tags_for_files_obj.get_base_directory(),
-                                                            write_m3u_file=False)
-
+        if self.refuse_if_busy():
+            return
+        # Walking the directory tree can take a while, so do it on a worker thread.
+        # The scan also writes the untracked files to an m3u file, as it used to do at startup.
+        log.debug('Editing untracked files')
+        self.window['FILE_OP_STATUS'].update('Looking for untracked files')
+        self.window['EDIT_UNTRACKED_FILES_BUTTON'].update(disabled=True)
+        self.start_background_operation(
+            lambda: self.tags_for_files_obj.find_untracked(self.tags_for_files_obj.get_base_directory()),
+            self.edit_untracked_files)
+
+    def edit_untracked_files(self, files_list):
+        self.window['EDIT_UNTRACKED_FILES_BUTTON'].update(disabled=False)
+        if isinstance(files_list, Exception):
+            self.window['FILE_OP_STATUS'].update(f'Looking for untracked files failed: {files_list}')
+            return
+        self.window['FILE_OP_STATUS'].update(f'Found {len(files_list)} untracked files')
         if len(files_list) == 0:
-            print('no untracked files found')
+            log.info('no untracked files found')
             return
 
         file_records_list = [FileRecord(0, path=f, file_exists=True) for f in files_list]
@@ -848,6 +1046,8 @@ class MainWindow:
         self.update_after_editing_files(num_edited)
 
     def do_edit_selected_files(self):
+        if self.refuse_if_busy():
+            return
         paths_list = self.window['FILES-LISTBOX'].get()
         # Gather the corresponding file records
         file_records_list = [self.tags_for_files_obj.find_record_for_path(p) for p in paths_list]
@@ -857,7 +1057,7 @@ class MainWindow:
         # Update
         num_edited = 0
         for file_record in file_records_list:
-            self.tags_for_files_obj.tags.update(file_record.tags)
+            self.tags_for_files_obj.index_file_record(file_record)
             if file_record.edited:
                 num_edited += 1
                 self.tags_for_files_obj.edited = True
@@ -865,13 +1065,12 @@ class MainWindow:
 
     def update_after_editing_files(self, num_edited):
         print(f'Edited {num_edited} file records.')
-        print(f'tags4files object edited = {self.tags_for_files_obj.edited}')
+        log.debug('tags4files object edited = %s', self.tags_for_files_obj.edited)
         if num_edited > 0 or self.tags_for_files_obj.edited:
             print(f'Export recommended.')
         # TODO: Update Window better than this
-        files_list = [record.path for record in self.tags_for_files_obj.file_records]
-        tag_list = list(self.tags_for_files_obj.tags)
-        tag_list.sort()
+        files_list = self.tags_for_files_obj.get_sorted_paths()
+        tag_list = self.tags_for_files_obj.get_sorted_tags()
         self.window['FILES-LISTBOX'].update(values=files_list)
         self.window['FILES-LISTBOX'].set_value([])
         self.window['TAGS-LISTBOX'].update(values=tag_list)
@@ -884,9 +1083,17 @@ class MainWindow:
 # EditFileWindow
 # ######################################################################
 class EditFileWindow:
+    # How long to wait after the last keystroke in the tag entry field before processing it.
+    edit_debounce_ms = 150
+
     def __init__(self, list_of_file_records):
         self.file_records = list_of_file_records
         self.cursor = 0
+        self._n_records = len(list_of_file_records)  # The list is fixed for the life of the window
+        self._edit_pending = False  # The tag entry field has changed but hasn't been processed yet
+        # (path, tags) as last drawn, so that unchanged widgets aren't redrawn.
+        self._last_rendered = (list_of_file_records[0].path, tuple(list_of_file_records[0].tags))
+        self._nav_disabled = (True, self._n_records < 2)  # Current state of the Prev and Next buttons
         self.layout = [
             [sg.InputText(list_of_file_records[0].path,
                           size=(120, 1), key='EDIT_FILE_RECORD_PATH',
@@ -909,16 +1116,18 @@ class EditFileWindow:
                 sg.Button('Prev Record', key='EDIT_FILE_PREV_RECORD_BUTTON', disabled=True,
                           expand_x=True),
                 sg.Button('Next Record', key='EDIT_FILE_NEXT_RECORD_BUTTON',
-                          disabled=len(list_of_file_records) < 2,
+                          disabled=self._n_records < 2,
                           expand_x=True),
             ],
             [sg.HorizontalSeparator()],
             [sg.Button('Back')]
         ]
-        edit_window_title = f'Editing {len(list_of_file_records)} File Records'
+        edit_window_title = f'Editing {self._n_records} File Records'
         self.window = sg.Window(edit_window_title, self.layout,
                                 modal=True, finalize=True,
                                 resizable=True,
+                                # Closing the window is reported while its widgets still exist, see run().
+                                enable_close_attempted_event=True,
                                 # return_keyboard_events=True
                                 )
         self.window['EDIT_FILE_RECORD_TAG_EDIT'].set_focus(True)
@@ -951,21 +1160,56 @@ class EditFileWindow:
 
     def increment_cursor_position(self, increment):
         new_value = self.cursor + increment
-        if 0 <= new_value < len(self.file_records):
-            self.cursor = new_value
-        self.window['EDIT_FILE_PREV_RECORD_BUTTON'].update(disabled=(self.cursor == 0))
-        self.window['EDIT_FILE_NEXT_RECORD_BUTTON'].update(
-            disabled=(self.cursor == (len(self.file_records) - 1)))
-        self.window['EDIT_FILE_RECORD_PATH'].update(value=self.file_records[self.cursor].path)
-        self.window['EDIT_FILE_RECORD_TAGS'].update(values=self.file_records[self.cursor].tags)
-        self.window['EDIT_FILE_RECORD_TAG_EDIT'].set_focus(True)
-        self.window['EDIT_FILE_RECORD_TAG_EDIT'].update(value='')
+        if new_value == self.cursor or not 0 <= new_value < self._n_records:
+            return
+        self.cursor = new_value
+        # The buttons only change state at either end of the list, so skip the updates in between.
+        nav_disabled = (self.cursor == 0, self.cursor == (self._n_records - 1))
+        if nav_disabled[0] != self._nav_disabled[0]:
+            self.window['EDIT_FILE_PREV_RECORD_BUTTON'].update(disabled=nav_disabled[0])
+        if nav_disabled[1] != self._nav_disabled[1]:
+            self.window['EDIT_FILE_NEXT_RECORD_BUTTON'].update(disabled=nav_disabled[1])
+        self._nav_disabled = nav_disabled
+        self.render_record_at_cursor()
+        tag_edit = self.window['EDIT_FILE_RECORD_TAG_EDIT']
+        if self.window.find_element_with_focus() is not tag_edit:
+            tag_edit.set_focus(True)
+        tag_edit.update(value='')
+
+    def render_record_at_cursor(self):
+        """
+        Show the path and tags of the record at the cursor, skipping the redraw if nothing changed.
+        """
+        record = self.file_records[self.cursor]
+        rendered = (record.path, tuple(record.tags))
+        if rendered == self._last_rendered:
+            return
+        if rendered[0] != self._last_rendered[0]:
+            self.window['EDIT_FILE_RECORD_PATH'].update(value=rendered[0])
+        if rendered[1] != self._last_rendered[1]:
+            self.window['EDIT_FILE_RECORD_TAGS'].update(values=rendered[1])
+        self._last_rendered = rendered
 
     def run(self):
         while True:
-            event, values = self.window.read()
-            # print(event, values)
-            if event == sg.WINDOW_CLOSED or event == 'Back':
+            # While the user is typing a tag, wake up after a short pause to process what they typed.
+            timeout = EditFileWindow.edit_debounce_ms if self._edit_pending else None
+            event, values = self.window.read(timeout=timeout)
+            if event == sg.WINDOW_CLOSE_ATTEMPTED_EVENT:
+                if self._edit_pending:
+                    # Don't lose tags typed just before the window was closed.
+                    self.take_tags_from_edit(final=False)
+                break
+            if event == sg.WINDOW_CLOSED:
+                break
+            if event == 'EDIT_FILE_RECORD_TAG_EDIT':
+                self._edit_pending = True
+                continue
+            if self._edit_pending or event == 'EDIT_FILE_RECORD_ADD_TAG':
+                # Any other event, including the timeout, means the user has stopped typing.
+                self.take_tags_from_edit(final=(event == 'EDIT_FILE_RECORD_ADD_TAG'))
+
+            if event == 'Back':
                 break
             elif event == 'Play':
                 path = self.file_records[self.cursor].path
@@ -974,30 +1218,35 @@ class EditFileWindow:
                 self.increment_cursor_position(-1)
             elif event == 'EDIT_FILE_NEXT_RECORD_BUTTON':
                 self.increment_cursor_position(1)
-            elif event == 'EDIT_FILE_RECORD_ADD_TAG':
-                s = self.window['EDIT_FILE_RECORD_TAG_EDIT'].get()
-                new_tag = Util.transform_to_tag(s.strip())
-                tag_ready = len(new_tag) > 0
-                new_edit_val = '' if tag_ready else new_tag
-                if tag_ready:
-                    self.add_tag(new_tag)
-                self.window['EDIT_FILE_RECORD_TAG_EDIT'].update(value=new_edit_val)
-            elif event == 'EDIT_FILE_RECORD_TAG_EDIT':
-                s = self.window['EDIT_FILE_RECORD_TAG_EDIT'].get()
-                if len(s.strip()) > 0:
-                    c = s[-1]
-                    tag_ready = c == ' '
-                    new_tag = Util.transform_to_tag(s.strip())
-                    new_edit_val = '' if tag_ready else new_tag
-                    if tag_ready and len(new_tag) > 0:
-                        self.add_tag(new_tag)
-                    self.window['EDIT_FILE_RECORD_TAG_EDIT'].update(value=new_edit_val)
             elif event == 'EDIT_FILE_COMMENTS_MULTILINE':
                 # print(self.window['EDIT_FILE_COMMENTS_MULTILINE'].get())
                 self.put_comments_at_cursor()
 
         self.window.close()
 
+    def take_tags_from_edit(self, final):
+        """
+        Add the tags typed into the tag entry field.
+        Since typing is processed after a pause, the field may hold several words.
+        A word is finished once it is followed by a space, or when final is True.
+        An unfinished word is left in the field, normalized as a tag.
+        """
+        self._edit_pending = False
+        s = self.window['EDIT_FILE_RECORD_TAG_EDIT'].get()
+        words = s.split()
+        if len(words) == 0:
+            if final:
+                self.window['EDIT_FILE_RECORD_TAG_EDIT'].update(value='')
+            return
+        remainder = ''
+        if not final and not s[-1].isspace():
+            remainder = Util.transform_to_tag(words.pop())
+        for word in words:
+            new_tag = Util.transform_to_tag(word)
+            if len(new_tag) > 0:
+                self.add_tag(new_tag)
+        self.window['EDIT_FILE_RECORD_TAG_EDIT'].update(value=remainder)
+
     def add_tag(self, tag):
         self.file_records[self.cursor].tags.add(tag)
         self.file_records[self.cursor].edited = True
@@ -1010,7 +1259,7 @@ class EditFileWindow:
                     file_record.tags.add(tag)
                     file_record.edited = True
 
-        self.window['EDIT_FILE_RECORD_TAGS'].update(values=self.file_records[self.cursor].tags)
+        self.render_record_at_cursor()
 
 
 # ######################################################################
@@ -1020,6 +1269,7 @@ if __name__ == '__main__':
     # ######################################################################
     # Parse arguments and set up primary data structures
     # ######################################################################
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
     parser = argparse.ArgumentParser('TagsForFiles')
     parser.add_argument('base',
                         help='Base directory for data',
@@ -1033,10 +1283,10 @@ if __name__ == '__main__':
 
     text_file_path = os.path.join(main_data_directory, "tags.txt")
     text_file_path = os.path.abspath(text_file_path)
-    print(f'text_file_path = {text_file_path}')
+    log.debug('text_file_path = %s', text_file_path)
 
     mainobj = TagsForFiles(text_file_path)
-    print(f'tags file base = {mainobj.get_base_directory()}')
+    log.debug('tags file base = %s', mainobj.get_base_directory())
 
     # Data format is as follows:
     # A record consists of a sequence of non-blank lines.
@@ -1047,7 +1297,6 @@ if __name__ == '__main__':
     # - A tag in the form '<k>=<v>' where k and v are both valid strings is considered
     #   to be a variable, with the name k and the value v.
     # - Complete records are separated by one or more blank lines.
-    pp = pprint.PrettyPrinter(indent=2)
 
     print()
     print(f"Read {len(mainobj.file_records)} files.")
@@ -1055,18 +1304,16 @@ if __name__ == '__main__':
     print()
     print(f"Read {len(mainobj.tags)} tags.")
 
+    missing_files, possible_dupes = mainobj.audit()
+
     print()
-    missing_files = mainobj.get_missing_files()
     print(f'{len(missing_files)} Missing files.')
 
     print()
-    possible_dupes = mainobj.find_duplicated_filenames()
     print(f'{len(possible_dupes)} Possibly-duplicated files.')
 
     print()
 
     mainobj.export()
 
-    mainobj.find_untracked(main_data_directory, Util.media_extensions)
-
     MainWindow(mainobj).run()
@@ -1,5 +1,9 @@
+import os
+import re
+import tempfile
 import unittest
 from unittest import TestCase
+from unittest import mock
 
 import TagsForFiles
 
@@ -23,3 +27,204 @@ class TagsForFilesTest(TestCase):
         result = TagsForFiles.Util.paragraph_wrap(
             "england expects     every    man to    do his     duty", 20)
         assert (result == "england expects\nevery man to do his\nduty")
+        result = TagsForFiles.Util.paragraph_wrap("a title=a-very-long-title-indeed b", 10)
+        assert (result == "a\ntitle=a-very-long-title-indeed\nb")
+
+    @staticmethod
+    def test_get_matching_tagged_files():
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data([
+            'a.mp3', 'rock year=2008', '',
+            'b.mp3', 'rock', 'jazz', '',
+            'c.mp3', 'jazz year=2008', '',
+        ])
+        assert (t4f.get_matching_tagged_files(['rock']) == {'a.mp3', 'b.mp3'})
+        assert (t4f.get_matching_tagged_files(['rock', 'jazz']) == {'b.mp3'})
+        assert (t4f.get_matching_tagged_files(['year=2008', 'jazz']) == {'c.mp3'})
+        assert (len(t4f.get_matching_tagged_files(['rock', 'blues'])) == 0)
+        assert (len(t4f.get_matching_tagged_files(['rock'], only_existing=True)) == 0)
+
+        t4f.replace_tag('rock', 'punk')
+        assert (t4f.get_matching_tagged_files(['punk', 'jazz']) == {'b.mp3'})
+        assert (len(t4f.get_matching_tagged_files(['rock'])) == 0)
+
+    @staticmethod
+    def test_add_path():
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data(['a.mp3', 'rock', '', 'b.mp3', 'jazz', '', 'a.mp3', 'loud', ''])
+        assert (len(t4f.file_records) == 2)
+        record = t4f.find_record_for_path('a.mp3')
+        assert (record.tags == {'rock', 'loud'})
+        assert (t4f.add_path('a.mp3') is record)
+        assert (t4f.find_record_for_path('c.mp3') is None)
+
+    @staticmethod
+    def test_count_tags():
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data(['a.mp3', 'rock loud', '', 'b.mp3', 'rock', '', 'c.mp3', 'rock loud jazz', ''])
+        assert (t4f.count_tags() == [('rock', 3), ('loud', 2), ('jazz', 1)])
+
+    @staticmethod
+    def test_transform_to_tag():
+        assert (TagsForFiles.Util.transform_to_tag('Intro - Dramatico') == 'intro-dramatico')
+        assert (TagsForFiles.Util.transform_to_tag('AC/DC (Live!)') == 'acdclive')
+        assert (TagsForFiles.Util.transform_to_tag('a------b') == 'a-b')
+
+    @staticmethod
+    def test_find_matching_for_text_term():
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data(['Music/Drama.mp3', 'rock', '', 'Music/Other.mp3', 'drama-queen', ''])
+        assert ([f.path for f in t4f.find_matching_files_for_text_term('DRAMA')] == ['Music/Drama.mp3'])
+        assert (t4f.find_matching_tags_for_text_term('Drama') == ['drama-queen'])
+        t4f.add_path('Music/Melodrama.mp3')
+        assert (len(t4f.find_matching_files_for_text_term('drama')) == 2)
+
+    @staticmethod
+    def test_import_text_data_from_file():
+        with tempfile.TemporaryDirectory() as tmp:
+            tags_path = os.path.join(tmp, 'tags.txt')
+            with open(tags_path, 'w', encoding='utf-8') as f:
+                f.write('a.mp3\n# a comment\nrock year=2008\n\nb.mp3\njazz\n')
+            t4f = TagsForFiles.TagsForFiles(tags_path)
+        assert ([f.path for f in t4f.file_records] == ['a.mp3', 'b.mp3'])
+        assert (t4f.file_records[0].comments == ['# a comment'])
+        assert (t4f.tags == {'rock', 'year=2008', 'jazz'})
+
+    @staticmethod
+    def test_find_duplicated_filenames():
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data(['x/a.mp3', 'rock', '', 'y/a.mp3', 'rock', '', 'z/a.mp3', 'rock', '', 'x/b.mp3', 'rock'])
+        assert (t4f.find_duplicated_filenames() == ['x/a.mp3', 'y/a.mp3', 'z/a.mp3'])
+
+    @staticmethod
+    def test_file_exists():
+        with tempfile.TemporaryDirectory() as tmp:
+            present = os.path.join(tmp, 'present.mp3')
+            missing = os.path.join(tmp, 'missing.mp3')
+            open(present, 'w').close()
+            t4f = TagsForFiles.TagsForFiles()
+            t4f.import_text_data([present, 'rock', '', missing, 'rock', ''])
+        assert (t4f.get_missing_files() == [missing])
+        assert (t4f.get_matching_tagged_files(['rock'], only_existing=True) == {present})
+
+    @staticmethod
+    def test_find_untracked():
+        with tempfile.TemporaryDirectory() as tmp:
+            os.mkdir(os.path.join(tmp, 'sub'))
+            tracked = os.path.join(tmp, 'tracked.mp3')
+            untracked = os.path.join(tmp, 'sub', 'untracked.MP3')
+            for path in (tracked, untracked, os.path.join(tmp, 'notes.txt')):
+                open(path, 'w').close()
+            t4f = TagsForFiles.TagsForFiles()
+            t4f.import_text_data([tracked, 'rock', ''])
+            result = t4f.find_untracked(tmp, write_m3u_file=False)
+        assert (result == [untracked])
+
+    @staticmethod
+    def test_selected_first():
+        result = TagsForFiles.MainWindow.selected_first(['a', 'b', 'c', 'd'], ['d', 'b', 'x'])
+        assert (result == ['b', 'd', 'a', 'c'])
+
+    @staticmethod
+    def test_write_file_records_to_file():
+        lines = ['b.mp3', 'rock year=2008', '', 'a.mp3', '# a comment', 'jazz', '']
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data(lines)
+        with tempfile.TemporaryDirectory() as tmp:
+            out_path = os.path.join(tmp, 'out.txt')
+            t4f.write_file_records_to_file(out_path)
+            with open(out_path, encoding='utf-8') as f:
+                text = f.read()
+        assert (text == 'a.mp3\n# a comment\njazz\n\nb.mp3\nrock year=2008\n\n')
+
+    @staticmethod
+    def test_build_tagged_files_map():
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data(['a.mp3', 'rock', '', 'b.mp3', 'rock jazz', ''])
+        assert (t4f.build_tagged_files_map() == {'rock': {'a.mp3', 'b.mp3'}, 'jazz': {'b.mp3'}})
+        assert (t4f.build_tagged_files_map(only_existing=True) == {'rock': set(), 'jazz': set()})
+
+    @staticmethod
+    def test_ends_with():
+        assert (TagsForFiles.Util.ends_with('song.mp3', ['wav', 'mp3']))
+        assert (not TagsForFiles.Util.ends_with('song.mp3', ['wav']))
+        assert (not TagsForFiles.Util.ends_with('song.mp3'))
+
+    @staticmethod
+    def test_make_time_stamped_file_name():
+        with mock.patch.object(TagsForFiles, 'main_data_directory', 'base', create=True):
+            file_name = TagsForFiles.Util.make_time_stamped_file_name('playlist', 'm3u')
+        assert (re.fullmatch(r'playlist-\d{4}-\d\d-\d\d-\d\d-\d\d-\d\d\.m3u', os.path.basename(file_name)))
+        assert (os.path.dirname(file_name) == 'base')
+
+    @staticmethod
+    def test_get_tags_from_files():
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data(['a.mp3', 'rock', '', 'b.mp3', 'rock jazz', '', 'c.mp3', 'blues', ''])
+        assert (sorted(t4f.get_tags_from_files(['a.mp3', 'b.mp3'])) == ['jazz', 'rock'])
+        assert (t4f.get_tags_from_files(['d.mp3']) == [])
+
+    @staticmethod
+    def test_audit():
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data(['x/a.mp3', 'rock', '', 'x/b.mp3', 'rock', '', 'y/a.mp3', 'rock', ''])
+        missing, duplicated = t4f.audit()
+        assert (missing == t4f.get_missing_files())
+        assert (duplicated == t4f.find_duplicated_filenames() == ['x/a.mp3', 'y/a.mp3'])
+
+    @staticmethod
+    def test_move_if_tagged():
+        with tempfile.TemporaryDirectory() as tmp:
+            keep = os.path.join(tmp, 'keep.mp3')
+            trash = os.path.join(tmp, 'trash.mp3')
+            for path in (keep, trash):
+                open(path, 'w').close()
+            t4f = TagsForFiles.TagsForFiles()
+            t4f.import_text_data([keep, 'rock', '', trash, 'rock to-delete', ''])
+            with mock.patch.object(TagsForFiles, 'main_data_directory', tmp, create=True):
+                t4f.delete()
+            moved = os.path.join(tmp, '.trash', 'trash.mp3')
+            assert (os.path.exists(moved) and not os.path.exists(trash))
+            assert (t4f.find_record_for_path(moved) is not None)
+            assert (t4f.find_record_for_path(trash) is None)
+            assert (t4f.get_matching_tagged_files(['rock', 'to-delete'], only_existing=True) == {moved})
+
+    @staticmethod
+    def test_find_untracked_relative_paths():
+        with tempfile.TemporaryDirectory() as tmp:
+            tracked = os.path.join(tmp, 'tracked.mp3')
+            open(tracked, 'w').close()
+            t4f = TagsForFiles.TagsForFiles()
+            t4f.import_text_data([tracked, 'rock', ''])
+            cwd = os.getcwd()
+            os.chdir(os.path.dirname(tmp))
+            try:
+                result = t4f.find_untracked(os.path.basename(tmp), write_m3u_file=False)
+            finally:
+                os.chdir(cwd)
+        assert (result == [])
+
+    @staticmethod
+    def test_clean_all_tags():
+        t4f = TagsForFiles.TagsForFiles()
+        t4f.import_text_data(['a.mp3', 'Rock', '', 'b.mp3', 'rock Jazz!', ''])
+        t4f.clean_all_tags()
+        assert (t4f.tags == {'rock', 'jazz'})
+        assert (t4f.get_matching_tagged_files(['rock']) == {'a.mp3', 'b.mp3'})
+        assert (len(t4f.get_matching_tagged_files(['Rock'])) == 0)
+
+    @staticmethod
+    def test_get_variables():
+        record = TagsForFiles.FileRecord(file_id=0, path='a.mp3', file_exists=None)
+        record.tags.update(['rock', 'year=2008', 'title=', '=x', 'a=b=c'])
+        assert (record.get_variables() == {'year': '2008'})
+
+    @staticmethod
+    def test_cached_query():
+        t4f = TagsForFiles.TagsForFiles()
+        for i in range(256):
+            t4f.cached_query(i, lambda: i)
+        t4f.cached_query(0, lambda: 'recomputed')
+        t4f.cached_query(256, lambda: 256)
+        assert (t4f.cached_query(0, lambda: 'recomputed') == 0)
+        assert (t4f.cached_query(1, lambda: 'recomputed') == 'recomputed')